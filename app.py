@@ -1,65 +1,99 @@
 import streamlit as st
-import json
 import os
 import hashlib
+import hmac
+import threading
 import datetime
+import bcrypt
 import openai
 import pandas as pd  # NEW: for the progress table
+import database as db
 
 # ------------------ CONFIG ------------------
 openai.api_key = os.getenv("OPENAI_API_KEY")  # set in terminal before run
-USERS_FILE = "users.json"
+USERS_FILE = "users.json"  # legacy store; new usernames are imported into SQLite at each process start
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+SYSTEM_PROMPT = "Now respond to user in a friendly supportive way."
 
 # ------------------ HELPERS ------------------
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
-
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
+@st.cache_resource
+def setup_db():
+    db.init_db()
+    if os.path.exists(USERS_FILE):
+        db.import_users_json(USERS_FILE)
 
 def hash_pw(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def check_pw(password, stored):
+    if stored.startswith("$2"):
+        return bcrypt.checkpw(password.encode(), stored.encode())
+    # legacy unsalted sha256 digest
+    return hmac.compare_digest(stored, hashlib.sha256(password.encode()).hexdigest())
 
 def add_user(username, password):
-    users = load_users()
-    if username in users:
+    if db.create_user(username, hash_pw(password)) is None:
         return False, "❌ Username already exists"
-    users[username] = {
-        "password": hash_pw(password),
-        "journal": [],
-        "habits": {}
-    }
-    save_users(users)
     return True, "✅ User created successfully"
 
 def login_user(username, password):
-    users = load_users()
-    if username in users and users[username]["password"] == hash_pw(password):
-        return True
-    return False
+    """Return the user's id on success, else None."""
+    user = db.get_user(username)
+    if not user or not check_pw(password, user[1]):
+        return None
+    user_id, stored = user
+    if not stored.startswith("$2"):
+        # upgrade legacy hashes on successful login
+        db.set_password(user_id, hash_pw(password))
+    return user_id
 
 # ------------------ AI CHAT ------------------
-def chat_with_ai(prompt, username):
-    users = load_users()
-    user_data = users.get(username, {})
-    journal = " ".join(user_data.get("journal", []))
-    habits = user_data.get("habits", {})
-    habit_summary = ", ".join([f"{h}:{'Done' if v else 'Missed'}" for h, v in habits.items()])
+@st.cache_resource
+def ctx_versions():
+    # per-user data versions shared by every session in the process, so a
+    # second tab or a fresh login never reuses another session's context
+    return {"lock": threading.Lock(), "by_user": {}}
+
+def ctx_ver(user_id):
+    return ctx_versions()["by_user"].get(user_id, 0)
+
+def bump_ctx_ver(user_id):
+    # invalidates the cached reads below after the user's journal or habits change
+    versions = ctx_versions()
+    with versions["lock"]:
+        versions["by_user"][user_id] = versions["by_user"].get(user_id, 0) + 1
 
-    context = f"User journal: {journal}\nUser habits: {habit_summary}\nNow respond to user in a friendly supportive way."
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_journals(user_id, ver):
+    return db.get_journals(user_id)
 
-    response = openai.chat.completions.create(
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_habits(user_id, ver):
+    return db.get_habits(user_id)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def build_context(user_id, ver):
+    journal = " ".join(f"{datetime.date.fromtimestamp(ts)}: {entry}" for entry, ts in cached_journals(user_id, ver))
+    habits = cached_habits(user_id, ver)
+    habit_summary = ", ".join([f"{h}:{'Done' if status == db.DONE else 'Missed'}" for _, h, status in habits])
+    return f"User journal: {journal}\nUser habits: {habit_summary}\n{SYSTEM_PROMPT}"
+
+def chat_with_ai(prompt, user_id):
+    context = build_context(user_id, ctx_ver(user_id))
+
+    stream = openai.chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": context},
             {"role": "user", "content": prompt}
-        ]
+        ],
+        stream=True
     )
-    return response.choices[0].message.content
+    for chunk in stream:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+setup_db()
 
 # ------------------ CUSTOM CSS ------------------
 st.markdown("""
@@ -146,15 +180,18 @@ elif choice == "Login":
     password = st.text_input("Password", type="password")
 
     if st.button("Login"):
-        if login_user(username.strip(), password.strip()):
+        user_id = login_user(username.strip(), password.strip())
+        if user_id is not None:
+            st.session_state["user_id"] = user_id
             st.session_state["username"] = username.strip()
             st.success("✅ Logged in successfully!")
         else:
             st.error("❌ Invalid username or password")
 
 # ------------------ AFTER LOGIN ------------------
-if "username" in st.session_state:
+if "user_id" in st.session_state:
     st.sidebar.success(f"Welcome, {st.session_state['username']}")
+    user_id = st.session_state["user_id"]
 
     tabs = st.tabs(["💬 AI Chat", "📓 Journaling", "✅ Habit Tracker"])
 
@@ -164,22 +201,21 @@ if "username" in st.session_state:
         user_msg = st.text_area("Your message")
         if st.button("Send to AI"):
             if user_msg:
-                reply = chat_with_ai(user_msg, st.session_state["username"])
-                st.write("🤖:", reply)
+                st.write("🤖:")
+                st.write_stream(chat_with_ai(user_msg, user_id))
 
     # Journaling
     with tabs[1]:
         st.header("Daily Journaling")
         journal_entry = st.text_area("Write about your day...")
         if st.button("Save Journal"):
-            users = load_users()
-            entry = f"{datetime.date.today()}: {journal_entry}"
-            users[st.session_state["username"]]["journal"].append(entry)
-            save_users(users)
+            db.add_journal(user_id, journal_entry)
+            bump_ctx_ver(user_id)
             st.success("✍️ Journal saved!")
 
         st.subheader("Previous Entries")
-        for j in load_users()[st.session_state["username"]]["journal"]:
+        for entry, ts in cached_journals(user_id, ctx_ver(user_id)):
+            j = f"{datetime.date.fromtimestamp(ts)}: {entry}"
             st.markdown(f"""
                 <div style="background:#fff;padding:15px;margin:10px 0;
                             border-radius:12px;box-shadow:0 4px 10px rgba(0,0,0,0.1);">
@@ -190,25 +226,25 @@ if "username" in st.session_state:
     # Habit Tracker (UPDATED: hides JSON, shows Date + Progress table)
     with tabs[2]:
         st.header("Daily Habit Checker")
-        users = load_users()
-        habits = users[st.session_state["username"]]["habits"]
 
         new_habit = st.text_input("Add a new habit")
         if st.button("Add Habit"):
             if new_habit:
-                habits[new_habit] = False
-                users[st.session_state["username"]]["habits"] = habits
-                save_users(users)
+                db.add_habit(user_id, new_habit)
+                bump_ctx_ver(user_id)
                 st.success("✅ Habit added!")
 
         # Checkboxes for today's habits
-        for habit, done in habits.items():
-            checked = st.checkbox(habit, value=done, key=f"habit_{habit}")
-            habits[habit] = checked
+        habits = {}
+        checked = {}
+        for habit_id, habit, status in cached_habits(user_id, ctx_ver(user_id)):
+            done = st.checkbox(habit, value=status == db.DONE, key=f"habit_{habit_id}")
+            habits[habit] = done
+            checked[habit_id] = db.DONE if done else db.PENDING
 
         if st.button("Save Progress"):
-            users[st.session_state["username"]]["habits"] = habits
-            save_users(users)
+            db.save_habits(user_id, checked)
+            bump_ctx_ver(user_id)
             st.success("📊 Habits updated!")
 
         # ---- Pretty table instead of white JSON box ----
@@ -1,40 +1,304 @@
+import contextlib
+import json
+import logging
+import os
 import sqlite3
+import threading
+import time
 
-# Connect to the database (or create it if it doesn't exist)
-conn = sqlite3.connect("mental_health.db")
-cursor = conn.cursor()
+# Set MENTAL_DB=:memory: to keep a throwaway database in RAM. It lives exactly
+# as long as the shared connection from get_conn(), i.e. until the process
+# exits or that connection is closed.
+# mental_health.db predates this schema (habits(habit_name, date, done), ...)
+# and is left as is; the app keeps its data in its own file.
+DB_PATH = os.environ.get("MENTAL_DB", "mindmate_app.db")
 
-# Create users table
-cursor.execute("""
+log = logging.getLogger(__name__)
+
+# habits.status values
+PENDING, DONE, SKIPPED = 0, 1, 2
+
+# Per-connection settings; journal_mode=WAL is persistent and set in init_db.
+CONNECT_PRAGMAS = """
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA mmap_size=268435456;
+PRAGMA busy_timeout=5000;
+PRAGMA foreign_keys=ON;
+"""
+
+# Every statement the helpers run, kept in one place so the SQL can be read
+# and reviewed together.
+INSERT_USER_SQL = "INSERT INTO users (username, password_hash) VALUES (?, ?)"
+IMPORT_USER_SQL = "INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)"
+GET_USER_SQL = "SELECT id, password_hash FROM users WHERE username = ?"
+SET_PASSWORD_SQL = "UPDATE users SET password_hash = ? WHERE id = ?"
+INSERT_JOURNAL_SQL = "INSERT INTO journals (user_id, entry) VALUES (?, ?)"
+IMPORT_JOURNAL_SQL = (
+    "INSERT INTO journals (user_id, entry, timestamp) "
+    "VALUES (?, ?, COALESCE(?, CAST(strftime('%s', 'now') AS INTEGER)))"
+)
+GET_JOURNALS_SQL = "SELECT entry, timestamp FROM journals WHERE user_id = ? ORDER BY timestamp, id"
+INSERT_HABIT_SQL = """
+INSERT INTO habits (user_id, habit)
+SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM habits WHERE user_id = ? AND habit = ?)
+"""
+IMPORT_HABIT_SQL = "INSERT INTO habits (user_id, habit, status) VALUES (?, ?, ?)"
+GET_HABITS_SQL = "SELECT id, habit, status FROM habits WHERE user_id = ? ORDER BY id"
+SET_HABIT_STATUS_SQL = "UPDATE habits SET status = ? WHERE id = ? AND user_id = ?"
+
+
+USERS_DDL = """
 CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id INTEGER PRIMARY KEY,
     username TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL
-)
-""")
+    password_hash TEXT NOT NULL
+)"""
 
-# Create habits table
-cursor.execute("""
+HABITS_DDL = """
 CREATE TABLE IF NOT EXISTS habits (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id INTEGER PRIMARY KEY,
     user_id INTEGER,
     habit TEXT NOT NULL,
-    status TEXT DEFAULT 'pending',
+    status INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (user_id) REFERENCES users(id)
-)
-""")
+)"""
 
-# Create journals table
-cursor.execute("""
+JOURNALS_DDL = """
 CREATE TABLE IF NOT EXISTS journals (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id INTEGER PRIMARY KEY,
     user_id INTEGER,
     entry TEXT NOT NULL,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
     FOREIGN KEY (user_id) REFERENCES users(id)
-)
-""")
+)"""
+
+# Whole schema in one transaction so bootstrap costs a single commit.
+SCHEMA_SQL = f"""
+BEGIN IMMEDIATE;
+{USERS_DDL};
+{HABITS_DDL};
+{JOURNALS_DDL};
+
+-- SQLite does not index foreign keys on its own
+CREATE INDEX IF NOT EXISTS idx_habits_user ON habits(user_id);
+CREATE INDEX IF NOT EXISTS idx_journals_user_ts ON journals(user_id, timestamp);
+
+COMMIT;
+"""
+
+
+# Bumped whenever a database written by an older database.py needs migrate().
+SCHEMA_VERSION = 3
+
+
+# Streamlit runs every rerun on a new thread, so one connection is shared by
+# the whole process; _lock serializes its use so transactions never interleave.
+_conn = None
+_lock = threading.RLock()
+
+
+def get_conn():
+    """Return the process-wide connection, opening and configuring it on first use.
+
+    Callers must hold _lock while using it; see locked() and transaction().
+    """
+    global _conn
+    with _lock:
+        if _conn is None:
+            # the default statement cache (128) holds every *_SQL constant above;
+            # isolation_level=None leaves BEGIN/COMMIT to transaction()
+            conn = sqlite3.connect(
+                DB_PATH,
+                check_same_thread=False,
+                isolation_level=None,
+                uri=DB_PATH.startswith("file:"),
+            )
+            conn.executescript(CONNECT_PRAGMAS)
+            _conn = conn
+        return _conn
+
+
+@contextlib.contextmanager
+def locked():
+    """Use the shared connection for single statements, which autocommit."""
+    with _lock:
+        yield get_conn()
+
+
+@contextlib.contextmanager
+def transaction():
+    """Run the block in one explicit transaction on the shared connection."""
+    with locked() as conn:
+        # IMMEDIATE takes the write lock up front, so a concurrent writer waits
+        # on busy_timeout instead of failing later with SQLITE_BUSY_SNAPSHOT
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # a failed COMMIT (e.g. a deferred constraint) can leave it open too
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+def _columns(conn, table):
+    """Return {column name: declared type} for a table; empty if it doesn't exist."""
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def migrate(conn):
+    """Bring tables created by an older database.py up to SCHEMA_VERSION."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1 and "password" in _columns(conn, "users"):
+        conn.execute("ALTER TABLE users RENAME COLUMN password TO password_hash")
+    if version < 2 and _columns(conn, "habits").get("status") == "TEXT":
+        # a TEXT column would keep storing the new integer codes as text, so
+        # rebuild the table and map the old 'pending'/'done'/'skipped' strings
+        conn.execute("ALTER TABLE habits RENAME TO habits_old")
+        conn.execute(HABITS_DDL)
+        conn.execute(
+            f"""
+            INSERT INTO habits (id, user_id, habit, status)
+            SELECT id, user_id, habit,
+                   CASE status WHEN 'done' THEN {DONE} WHEN 'skipped' THEN {SKIPPED} ELSE {PENDING} END
+            FROM habits_old
+            """
+        )
+        conn.execute("DROP TABLE habits_old")
+    if version < 3 and _columns(conn, "journals").get("timestamp") == "DATETIME":
+        # CURRENT_TIMESTAMP text ('YYYY-MM-DD HH:MM:SS', UTC) becomes unix seconds
+        conn.execute("ALTER TABLE journals RENAME TO journals_old")
+        conn.execute(JOURNALS_DDL)
+        conn.execute(
+            """
+            INSERT INTO journals (id, user_id, entry, timestamp)
+            SELECT id, user_id, entry,
+                   COALESCE(CAST(strftime('%s', timestamp) AS INTEGER),
+                            CAST(strftime('%s', 'now') AS INTEGER))
+            FROM journals_old
+            """
+        )
+        conn.execute("DROP TABLE journals_old")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def init_db():
+    # Connect to the database (or create it if it doesn't exist)
+    with locked() as conn:
+        # page_size only takes effect on an empty database, before WAL is enabled;
+        # on an existing file it is a no-op
+        conn.execute("PRAGMA page_size=8192")
+        # journal_mode can't change inside a transaction, so set it first
+        conn.execute("PRAGMA journal_mode=WAL")
+        with transaction():
+            migrate(conn)
+        # executescript() commits before it runs, so the script carries its own
+        # BEGIN; roll it back here so a failed statement can't leave it open
+        try:
+            conn.executescript(SCHEMA_SQL)
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+    log.info("Database and tables ready at %s", DB_PATH)
+
+
+# ------------------ USERS ------------------
+def create_user(username, password_hash):
+    """Insert a user and return its id, or None if the username is taken."""
+    with locked() as conn:
+        try:
+            cur = conn.execute(INSERT_USER_SQL, (username, password_hash))
+        except sqlite3.IntegrityError:
+            return None
+        return cur.lastrowid
+
+
+def get_user(username):
+    """Return (id, password_hash) for a username, or None."""
+    with locked() as conn:
+        return conn.execute(GET_USER_SQL, (username,)).fetchone()
+
+
+def set_password(user_id, password_hash):
+    with locked() as conn:
+        conn.execute(SET_PASSWORD_SQL, (password_hash, user_id))
+
+
+# ------------------ JOURNALS ------------------
+def add_journal(user_id, entry):
+    add_journals(user_id, [entry])
+
+
+def add_journals(user_id, entries):
+    """Insert many entries for one user in a single transaction."""
+    with transaction() as conn:
+        conn.executemany(INSERT_JOURNAL_SQL, [(user_id, e) for e in entries])
+
+
+def get_journals(user_id):
+    """Return [(entry, unix timestamp), ...] oldest first."""
+    with locked() as conn:
+        return conn.execute(GET_JOURNALS_SQL, (user_id,)).fetchall()
+
+
+# ------------------ HABITS ------------------
+def add_habit(user_id, habit):
+    with locked() as conn:
+        conn.execute(INSERT_HABIT_SQL, (user_id, habit, user_id, habit))
+
+
+def get_habits(user_id):
+    """Return [(id, habit, status), ...] in creation order."""
+    with locked() as conn:
+        return conn.execute(GET_HABITS_SQL, (user_id,)).fetchall()
+
+
+def save_habits(user_id, statuses):
+    """Write {habit_id: status} for one user in a single transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            SET_HABIT_STATUS_SQL,
+            [(status, habit_id, user_id) for habit_id, status in statuses.items()],
+        )
+
+
+# ------------------ MIGRATION ------------------
+def import_users_json(path):
+    """Copy users from the old users.json store; existing usernames are skipped."""
+    with open(path, "r") as f:
+        users = json.load(f)
+
+    with transaction() as conn:
+        for username, data in users.items():
+            cur = conn.execute(IMPORT_USER_SQL, (username, data["password"]))
+            if cur.rowcount == 0:
+                continue
+            user_id = cur.lastrowid
+            journals = []
+            for item in data.get("journal", []):
+                # entries were stored as "YYYY-MM-DD: text"
+                day, sep, entry = item.partition(": ")
+                try:
+                    midnight = int(time.mktime(time.strptime(day, "%Y-%m-%d"))) if sep else None
+                except ValueError:
+                    # text that merely contains ": " keeps its full entry, undated
+                    midnight = None
+                if midnight is None:
+                    journals.append((user_id, item, None))
+                else:
+                    journals.append((user_id, entry, midnight))
+            conn.executemany(IMPORT_JOURNAL_SQL, journals)
+            conn.executemany(
+                IMPORT_HABIT_SQL,
+                [(user_id, h, DONE if v else PENDING) for h, v in data.get("habits", {}).items()],
+            )
+
 
-conn.commit()
-conn.close()
-print("✅ Database and tables created successfully!")
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with contextlib.closing(get_conn()):
+        init_db()
@@ -1,12 +1,80 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
+import asyncio
+import hashlib
+import httpx
+import json
 import os
+import time
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+CACHE_FILE = os.path.expanduser("~/.cache/openai_models.json")
+CACHE_TTL = 24 * 60 * 60  # seconds
 
-try:
-    response = client.models.list()
-    print("✅ API key works! Models available:")
-    for m in response.data[:5]:  # show first 5 models
-        print("-", m.id)
-except Exception as e:
-    print("❌ Error:", e)
+api_key = os.getenv("OPENAI_API_KEY")
+# only a fingerprint is written to disk, so a changed key misses the cache
+key_id = hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def make_client():
+    return AsyncOpenAI(
+        api_key=api_key,
+        # the SDK retries 429/5xx and connection errors with exponential backoff + jitter
+        max_retries=5,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=60),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        ),
+    )
+
+
+def load_cached_models():
+    try:
+        if time.time() - os.path.getmtime(CACHE_FILE) > CACHE_TTL:
+            return None
+        with open(CACHE_FILE, "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # anything unexpected in the file means a live fetch, not an error
+    if not isinstance(cached, dict) or cached.get("key") != key_id:
+        return None
+    models = cached.get("models")
+    return models if isinstance(models, list) else None
+
+
+def save_cached_models(models):
+    # best effort: a read-only or full disk only costs the next run a live fetch
+    tmp = CACHE_FILE + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump({"key": key_id, "models": models}, f)
+        # readers never see a half-written file
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        pass
+
+
+async def fetch_models():
+    async with make_client() as client:
+        response = await client.models.list()
+        # probe the first 5 models concurrently rather than one round trip at a time
+        probed = await asyncio.gather(*[client.models.retrieve(m.id) for m in response.data[:5]])
+    return [m.id for m in probed] + [m.id for m in response.data[5:]]
+
+
+async def main():
+    try:
+        models = load_cached_models()
+        source = "cached"
+        if models is None:
+            models = await fetch_models()
+            save_cached_models(models)
+            source = "live"
+        print(f"✅ API key works! Models available ({source}):")
+        for m in models[:5]:  # show first 5 models
+            print("-", m)
+    except Exception as e:
+        print("❌ Error:", e)
+
+
+asyncio.run(main())